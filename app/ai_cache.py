@@ -0,0 +1,128 @@
+# app/ai_cache.py
+"""Semantic cache for LLM rule extraction.
+
+Rule extraction is deterministic at temperature=0 and policy texts rarely
+change between runs, so we cache extracted rules keyed on an embedding of
+(scope, policy_text). A lookup embeds the incoming text once (cheap compared
+to a full extraction round-trip) and returns the cached rules when the best
+cosine similarity within the same scope clears a high threshold.
+
+The cache degrades gracefully: if the embeddings integration or API key is
+unavailable, lookups miss and stores are no-ops.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import Column, Integer, LargeBinary, MetaData, String, Table, Text
+
+from .db import engine
+
+# Similarity must clear this bar before we trust a cached extraction.
+DEFAULT_THRESHOLD = 0.97
+
+_metadata = MetaData()
+
+_semantic_cache_table = Table(
+    "llm_semantic_cache",
+    _metadata,
+    Column("id", Integer, primary_key=True),
+    Column("scope", String, index=True),
+    Column("emb", LargeBinary),  # float32 vector, L2-normalized
+    Column("rules_json", Text),
+)
+
+
+def _get_embedder():
+    try:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    except Exception:
+        return None
+    if not os.getenv("GOOGLE_API_KEY"):
+        return None
+    return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+
+
+class SemanticCache:
+    """Embedding-keyed cache of extracted rules, backed by the app DB."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._embedder = None
+        self._embedder_ready = False
+
+    def _embed(self, scope: str, text: str) -> Optional[np.ndarray]:
+        if not self._embedder_ready:
+            self._embedder = _get_embedder()
+            self._embedder_ready = True
+        if self._embedder is None:
+            return None
+        try:
+            vec = np.asarray(
+                self._embedder.embed_query(f"scope={scope}\n{text}"), dtype=np.float32
+            )
+        except Exception:
+            return None
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return None
+        return vec / norm
+
+    def _ensure_table(self) -> None:
+        _metadata.create_all(bind=engine, checkfirst=True)
+
+    def lookup(self, scope: str, text: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached rules for a near-identical (scope, text), else None."""
+        emb = self._embed(scope, text)
+        if emb is None:
+            return None
+        try:
+            self._ensure_table()
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    _semantic_cache_table.select().where(
+                        _semantic_cache_table.c.scope == scope
+                    )
+                ).all()
+        except Exception:
+            return None
+
+        best_score = -1.0
+        best_rules = None
+        for row in rows:
+            stored = np.frombuffer(row.emb, dtype=np.float32)
+            if stored.shape != emb.shape:
+                continue
+            score = float(np.dot(stored, emb))
+            if score > best_score:
+                best_score = score
+                best_rules = row.rules_json
+        if best_rules is not None and best_score >= self.threshold:
+            try:
+                return json.loads(best_rules)
+            except Exception:
+                return None
+        return None
+
+    def store(self, scope: str, text: str, rules: List[Dict[str, Any]]) -> None:
+        emb = self._embed(scope, text)
+        if emb is None or not rules:
+            return
+        try:
+            self._ensure_table()
+            with engine.begin() as conn:
+                conn.execute(
+                    _semantic_cache_table.insert().values(
+                        scope=scope,
+                        emb=emb.tobytes(),
+                        rules_json=json.dumps(rules, ensure_ascii=False),
+                    )
+                )
+        except Exception:
+            # Cache is best-effort; never fail the extraction over it.
+            pass
+
+
+# Shared instance used by app.ai; per-process state is just the embedder client.
+semantic_cache = SemanticCache()
@@ -1,18 +1,28 @@
 # app/app.py
+import hashlib
 import os
 import shutil
 import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from flask import (
     Flask, request, render_template, redirect,
-    url_for, jsonify, flash, send_file
+    url_for, jsonify, flash, send_file,
+    Response, stream_with_context, g,
 )
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-import requests
 
-from .db import Base, engine, get_db
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .db import Base, engine, get_db, SessionLocal
 from .models import Policy, Rule, Dataset, Violation
-from .compliance import run_compliance
+from .compliance import run_compliance, convert_to_parquet
 from .policy_parser import parse_rules_from_text
 
 def _upload_dir_default() -> str:
@@ -26,15 +36,196 @@ def _upload_dir_default() -> str:
 
 UPLOAD_DIR = _upload_dir_default()
 
+# Max rows shown on the listing pages; unbounded .all() makes them slower
+# as policies/datasets accumulate.
+LIST_LIMIT = 50
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Several times faster than stdlib json on large payloads (notably
+    /api/violations) and serializes straight to bytes.
+    """
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _pretty_json(obj) -> str:
+    """Indented JSON for templates, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+def _policy_text_hash(policy: Policy) -> str:
+    """Fingerprint of what rule extraction depends on (text + scope)."""
+    raw = (policy.raw_text or "") + (policy.scope or "both")
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _rule_mappings(policy_id: int, rules_json) -> list:
+    """Row mappings for bulk-inserting extracted rules for one policy."""
+    return [
+        {
+            "policy_id": policy_id,
+            "rule_code": r.get("rule_id") or r.get("rule_code"),
+            "description": r.get("description", ""),
+            "category": r.get("category", "leave"),  # leave or benefit
+            "severity": r.get("severity", "medium"),
+            "check_type": r.get("check_type", ""),
+            "params": r.get("params", {}),
+        }
+        for r in rules_json
+    ]
+
+
+# Background workers for compliance runs; two is plenty for an MVP and
+# bounds concurrent LLM usage. Job futures are kept per-process; the
+# registry is bounded because nothing is guaranteed to poll the status
+# endpoint, so finished entries would otherwise pile up forever.
+_RUN_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+_RUN_JOBS = {}
+_RUN_JOBS_MAX = 50
+
+
+def _prune_run_jobs():
+    """Drop oldest finished jobs once the registry exceeds its cap.
+
+    Dicts iterate in insertion order, so the earliest submissions go
+    first; running jobs are never evicted.
+    """
+    if len(_RUN_JOBS) < _RUN_JOBS_MAX:
+        return
+    for jid, fut in list(_RUN_JOBS.items()):
+        if fut.done():
+            _RUN_JOBS.pop(jid, None)
+            if len(_RUN_JOBS) < _RUN_JOBS_MAX:
+                return
+
+
+def _execute_compliance_run(policy_id: int, dataset_id: int, explain: bool) -> int:
+    """Worker for /compliance/run: clear, re-check, and optionally explain.
+
+    Runs on the executor with its own DB session (request sessions are
+    closed when the route returns). Returns the number of violations found.
+    """
+    db_session = SessionLocal.session_factory()
+    try:
+        # Clear previous violations for this pair (optional). The delete is
+        # not committed here: it rides in the same transaction as the inserts
+        # run_compliance flushes, so the pair swaps atomically with one fsync.
+        # synchronize_session=False skips hydrating the deleted rows.
+        db_session.query(Violation).filter(
+            Violation.policy_id == policy_id,
+            Violation.dataset_id == dataset_id,
+        ).delete(synchronize_session=False)
+
+        violations = run_compliance(db_session, policy_id, dataset_id)
+
+        # Optionally generate explanations via LangChain (one batched LLM
+        # call per EXPLAIN_BATCH_SIZE violations instead of one per violation)
+        if explain and violations:
+            # Prefetch referenced rules/policies in two queries instead of
+            # two per violation.
+            rules_by_id = {
+                r.id: r
+                for r in db_session.query(Rule)
+                .filter(Rule.id.in_({v.rule_id for v in violations}))
+                .all()
+            }
+            policies_by_id = {
+                p.id: p
+                for p in db_session.query(Policy)
+                .filter(Policy.id.in_({v.policy_id for v in violations}))
+                .all()
+            }
+
+            payloads = []
+            for v in violations:
+                rule: Rule = rules_by_id.get(v.rule_id)
+                policy: Policy = policies_by_id.get(v.policy_id)
+                payloads.append({
+                    "violation_id": v.id,
+                    "policy_name": policy.name if policy else "",
+                    "policy_text": policy.raw_text if policy else "",
+                    "scope": rule.category if rule else "",
+                    "rule": {
+                        "rule_code": rule.rule_code,
+                        "description": rule.description,
+                        "category": rule.category,
+                        "severity": rule.severity,
+                        "check_type": rule.check_type,
+                        "params": rule.params,
+                    },
+                    "evidence": v.evidence,
+                    "employee_identifier": v.employee_identifier,
+                })
+
+            try:
+                from .ai import explain_violations_batch, explain_violations_concurrently
+                explanations = explain_violations_batch(payloads)
+                if not explanations:
+                    # Batched response didn't parse; retry with concurrent
+                    # per-violation calls (schema-safe, still parallel).
+                    explanations = explain_violations_concurrently(payloads)
+                # The violations are already session-tracked (they came from
+                # run_compliance on this session); setting the attribute is
+                # enough for the commit below to flush it.
+                for v in violations:
+                    explanation = explanations.get(v.id)
+                    if explanation:
+                        v.explanation = explanation
+            except Exception as e:
+                print(f"explanation error: {e}")
+
+            db_session.commit()
+
+        return len(violations)
+    finally:
+        db_session.close()
+
 
 def create_app():
     app = Flask(__name__)
     app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret")
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
     # Create DB tables
     Base.metadata.create_all(bind=engine)
 
+    # Lightweight migration for DBs created before Policy.text_hash existed
+    # (create_all doesn't alter existing tables).
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE policies ADD COLUMN text_hash VARCHAR")
+    except Exception:
+        pass
+
+    # Composite indexes for the hot run_compliance queries; IF NOT EXISTS
+    # covers DBs whose tables predate the Index() declarations.
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_rule_policy_category "
+                "ON rules (policy_id, category)"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_viol_policy_dataset "
+                "ON violations (policy_id, dataset_id)"
+            )
+    except Exception:
+        pass
+
     # Seed demo data on first run (idempotent)
     # Only when there are no policies and no datasets yet.
     try:
@@ -51,19 +242,36 @@ def create_app():
     # - GOOGLE_API_KEY (required)
     # - GEMINI_MODEL (optional, default: gemini-2.5-flash)
 
+    # One DB session per request, closed deterministically on teardown
+    # (the old next(get_db()) pattern left cleanup to garbage collection).
+    # Sessions come from the underlying factory, not the thread-local scoped
+    # registry, so closing them can't detach instances held by callers that
+    # drive the app in-process (smoke scripts via test_client).
+    @app.before_request
+    def _open_db_session():
+        g.db = SessionLocal.session_factory()
+
+    @app.teardown_appcontext
+    def _close_db_session(exc):
+        db = g.pop("db", None)
+        if db is not None:
+            db.close()
+
     # ---------- ROUTES ----------
 
     @app.route("/")
     def index():
-        db = next(get_db())
-        policies = db.query(Policy).all()
-        datasets = db.query(Dataset).all()
-        violations = db.query(Violation).all()
+        db = g.db
+        # Show only the most recent entries.
+        policies = db.query(Policy).order_by(Policy.id.desc()).limit(LIST_LIMIT).all()
+        datasets = db.query(Dataset).order_by(Dataset.id.desc()).limit(LIST_LIMIT).all()
+        # COUNT in SQL; the template only needs the number, not N ORM objects.
+        violations_count = db.query(func.count(Violation.id)).scalar()
         return render_template(
             "index.html",
             policies=policies,
             datasets=datasets,
-            violations_count=len(violations),
+            violations_count=violations_count,
         )
 
     # ---- Settings ----
@@ -74,7 +282,6 @@ def create_app():
         # Check package availability
         try:
             import langchain  # noqa: F401
-            import langgraph  # noqa: F401
             from langchain_google_genai import ChatGoogleGenerativeAI  # noqa: F401
             pkgs_ok = True
         except Exception:
@@ -101,7 +308,7 @@ def create_app():
     # ---- Policies ----
     @app.route("/policies", methods=["GET", "POST"])
     def policies():
-        db = next(get_db())
+        db = g.db
         if request.method == "POST":
             name = request.form.get("name")
             raw_text = request.form.get("raw_text")
@@ -115,7 +322,9 @@ def create_app():
                 flash("Policy created", "success")
                 return redirect(url_for("policies"))
 
-        policies_list = db.query(Policy).all()
+        policies_list = (
+            db.query(Policy).order_by(Policy.id.desc()).limit(LIST_LIMIT).all()
+        )
 
         # Optional selected policy for side-by-side view
         selected_policy = None
@@ -140,7 +349,7 @@ def create_app():
                         }
                         for r in rules
                     ]
-                    rules_json_str = json.dumps(rules_payload, indent=2, ensure_ascii=False)
+                    rules_json_str = _pretty_json(rules_payload)
         except Exception:
             # Non-fatal; simply don't show selection block
             selected_policy = None
@@ -172,17 +381,25 @@ def create_app():
             scope=scope,
             raw_text=text,
             result_json=result,
-            result_json_str=json.dumps(result or [], indent=2, ensure_ascii=False),
+            result_json_str=_pretty_json(result or []),
             error=error,
         )
 
     @app.route("/policies/<int:policy_id>/extract_rules", methods=["POST"])
     def extract_rules(policy_id):
-        db = next(get_db())
+        db = g.db
         policy = db.query(Policy).filter(Policy.id == policy_id).first()
         if not policy:
             return "Policy not found", 404
 
+        # Unchanged text with saved rules: nothing to re-extract.
+        current_hash = _policy_text_hash(policy)
+        if policy.text_hash == current_hash and (
+            db.query(Rule).filter(Rule.policy_id == policy.id).count() > 0
+        ):
+            flash("Policy text unchanged; using previously extracted rules.", "success")
+            return redirect(url_for("view_rules", policy_id=policy.id))
+
         try:
             from .ai import extract_rules_with_langgraph
             rules_json = extract_rules_with_langgraph(policy.raw_text, policy.scope)
@@ -190,24 +407,15 @@ def create_app():
             flash(f"Rule extraction error: {e}", "error")
             return redirect(url_for("policies"))
 
-        for r in rules_json:
-            rule = Rule(
-                policy_id=policy.id,
-                rule_code=r.get("rule_id") or r.get("rule_code"),
-                description=r.get("description", ""),
-                category=r.get("category", "leave"),  # leave or benefit
-                severity=r.get("severity", "medium"),
-                check_type=r.get("check_type", ""),
-                params=r.get("params", {}),
-            )
-            db.add(rule)
+        db.bulk_insert_mappings(Rule, _rule_mappings(policy.id, rules_json))
+        policy.text_hash = current_hash
         db.commit()
         flash(f"Extracted {len(rules_json)} rules from policy", "success")
         return redirect(url_for("policies"))
 
     @app.route("/policies/<int:policy_id>/extract_rules_simple", methods=["POST"])
     def extract_rules_simple(policy_id):
-        db = next(get_db())
+        db = g.db
         policy = db.query(Policy).filter(Policy.id == policy_id).first()
         if not policy:
             return "Policy not found", 404
@@ -218,27 +426,41 @@ def create_app():
             flash("No rules recognized. Please follow the simple-English patterns documented in README.", "error")
             return redirect(url_for("policies"))
 
-        for r in rules_json:
-            rule = Rule(
-                policy_id=policy.id,
-                rule_code=r.get("rule_id") or r.get("rule_code"),
-                description=r.get("description", ""),
-                category=r.get("category", "leave"),
-                severity=r.get("severity", "medium"),
-                check_type=r.get("check_type", ""),
-                params=r.get("params", {}),
-            )
-            db.add(rule)
+        db.bulk_insert_mappings(Rule, _rule_mappings(policy.id, rules_json))
         db.commit()
         flash(f"Extracted {len(rules_json)} rules from policy (simple parser)", "success")
         return redirect(url_for("policies"))
 
     @app.route("/policies/<int:policy_id>/extract_rules_preview", methods=["POST"])
     def extract_rules_preview(policy_id):
-        db = next(get_db())
+        db = g.db
         policy = db.query(Policy).filter(Policy.id == policy_id).first()
         if not policy:
             return "Policy not found", 404
+
+        # Preview from saved rules when the text hasn't changed since the
+        # last extraction — no LLM round-trip.
+        if policy.text_hash == _policy_text_hash(policy):
+            saved = db.query(Rule).filter(Rule.policy_id == policy.id).all()
+            if saved:
+                rules_json = [
+                    {
+                        "rule_code": r.rule_code,
+                        "description": r.description,
+                        "category": r.category,
+                        "severity": r.severity,
+                        "check_type": r.check_type,
+                        "params": r.params,
+                    }
+                    for r in saved
+                ]
+                return render_template(
+                    "rules_preview.html",
+                    policy=policy,
+                    rules_json=rules_json,
+                    rules_json_str=_pretty_json(rules_json),
+                )
+
         try:
             from .ai import extract_rules_with_langgraph
             rules_json = extract_rules_with_langgraph(policy.raw_text, policy.scope)
@@ -249,12 +471,12 @@ def create_app():
             "rules_preview.html",
             policy=policy,
             rules_json=rules_json,
-            rules_json_str=json.dumps(rules_json, indent=2, ensure_ascii=False),
+            rules_json_str=_pretty_json(rules_json),
         )
 
     @app.route("/policies/<int:policy_id>/save_rules", methods=["POST"])
     def save_rules(policy_id):
-        db = next(get_db())
+        db = g.db
         policy = db.query(Policy).filter(Policy.id == policy_id).first()
         if not policy:
             return "Policy not found", 404
@@ -267,26 +489,16 @@ def create_app():
             flash(f"Invalid rules JSON: {e}", "error")
             return redirect(url_for("policies"))
 
-        count = 0
-        for r in rules_json:
-            rule = Rule(
-                policy_id=policy.id,
-                rule_code=r.get("rule_id") or r.get("rule_code"),
-                description=r.get("description", ""),
-                category=r.get("category", "leave"),
-                severity=r.get("severity", "medium"),
-                check_type=r.get("check_type", ""),
-                params=r.get("params", {}),
-            )
-            db.add(rule)
-            count += 1
+        mappings = _rule_mappings(policy.id, rules_json)
+        db.bulk_insert_mappings(Rule, mappings)
+        policy.text_hash = _policy_text_hash(policy)
         db.commit()
-        flash(f"Saved {count} rules to policy {policy.name}", "success")
+        flash(f"Saved {len(mappings)} rules to policy {policy.name}", "success")
         return redirect(url_for("view_rules", policy_id=policy.id))
 
     @app.route("/policies/<int:policy_id>/rules")
     def view_rules(policy_id):
-        db = next(get_db())
+        db = g.db
         policy = db.query(Policy).filter(Policy.id == policy_id).first()
         if not policy:
             return "Policy not found", 404
@@ -296,7 +508,7 @@ def create_app():
     # ---- Datasets ----
     @app.route("/datasets", methods=["GET", "POST"])
     def datasets():
-        db = next(get_db())
+        db = g.db
         if request.method == "POST":
             name = request.form.get("name")
             description = request.form.get("description")
@@ -309,6 +521,8 @@ def create_app():
                 filename = secure_filename(file.filename)
                 path = os.path.join(UPLOAD_DIR, filename)
                 file.save(path)
+                # Columnar sidecar so compliance runs skip CSV parsing
+                convert_to_parquet(path)
 
                 d = Dataset(
                     name=name,
@@ -321,15 +535,19 @@ def create_app():
                 flash("Dataset uploaded", "success")
                 return redirect(url_for("datasets"))
 
-        datasets = db.query(Dataset).all()
-        policies = db.query(Policy).all()
+        datasets = (
+            db.query(Dataset).order_by(Dataset.id.desc()).limit(LIST_LIMIT).all()
+        )
+        policies = (
+            db.query(Policy).order_by(Policy.id.desc()).limit(LIST_LIMIT).all()
+        )
         return render_template(
             "datasets.html", datasets=datasets, policies=policies
         )
 
     @app.route("/datasets/<int:dataset_id>/download", methods=["GET"])
     def download_dataset(dataset_id: int):
-        db = next(get_db())
+        db = g.db
         d = db.query(Dataset).filter(Dataset.id == dataset_id).first()
         if not d or not d.file_path:
             flash("Dataset not found", "error")
@@ -351,30 +569,77 @@ def create_app():
     # ---- Compliance run ----
     @app.route("/compliance/run", methods=["POST"])
     def run_compliance_route():
-        db_session = next(get_db())
         policy_id = int(request.form.get("policy_id"))
         dataset_id = int(request.form.get("dataset_id"))
         explain = request.form.get("explain") == "on"
 
-        # Clear previous violations for this pair (optional)
-        db_session.query(Violation).filter(
-            Violation.policy_id == policy_id,
-            Violation.dataset_id == dataset_id,
-        ).delete()
+        # Run off the request thread: holding the HTTP connection through
+        # the CSV scan plus LLM explanations starves workers under load.
+        job_id = uuid.uuid4().hex
+        future = _RUN_EXECUTOR.submit(
+            _execute_compliance_run, policy_id, dataset_id, explain
+        )
 
-        violations = run_compliance(db_session, policy_id, dataset_id)
+        def _log_outcome(fut, _job_id=job_id):
+            # Background failures would otherwise vanish with the future;
+            # surface them in the app log as soon as the job finishes.
+            exc = fut.exception()
+            if exc is not None:
+                app.logger.error("Compliance run %s failed: %s", _job_id, exc)
 
-        # Optionally generate explanations via LangChain
-        if explain and violations:
+        future.add_done_callback(_log_outcome)
+        _prune_run_jobs()
+        _RUN_JOBS[job_id] = future
+
+        flash(
+            f"Compliance run started (job {job_id}); violations appear below "
+            "as they complete.",
+            "success",
+        )
+        return redirect(url_for("violations"))
+
+    @app.route("/compliance/status/<job_id>")
+    def compliance_status(job_id):
+        future = _RUN_JOBS.get(job_id)
+        if future is None:
+            return jsonify({"error": "Unknown job id"}), 404
+        if not future.done():
+            return jsonify({"status": "running"})
+        # Terminal state: evict the entry so finished futures (and their
+        # results) don't accumulate for the life of the process. Polling
+        # again after this returns 404, which clients treat as final.
+        _RUN_JOBS.pop(job_id, None)
+        try:
+            return jsonify({"status": "done", "violations": future.result()})
+        except Exception as e:
+            return jsonify({"status": "error", "error": str(e)})
+
+    @app.route("/compliance/stream")
+    def stream_explanations():
+        """Stream explanations for a (policy, dataset) pair as server-sent events.
+
+        Each frame carries {violation_id, delta}; the explanation is committed
+        to the DB once its violation finishes, so first output appears after
+        one LLM time-to-first-token instead of after all completions.
+        """
+        db = g.db
+        policy_id = int(request.args.get("policy_id"))
+        dataset_id = int(request.args.get("dataset_id"))
+
+        policy = db.query(Policy).filter(Policy.id == policy_id).first()
+        violations = (
+            db.query(Violation)
+            .filter(
+                Violation.policy_id == policy_id,
+                Violation.dataset_id == dataset_id,
+            )
+            .all()
+        )
+
+        def generate():
+            from .ai import explain_violation_stream
             for v in violations:
-                rule: Rule = (
-                    db_session.query(Rule).filter(Rule.id == v.rule_id).first()
-                )
-                policy: Policy = (
-                    db_session.query(Policy)
-                    .filter(Policy.id == v.policy_id)
-                    .first()
-                )
+                rule = db.query(Rule).filter(Rule.id == v.rule_id).first()
                 payload = {
                     "violation_id": v.id,
                     "policy_name": policy.name if policy else "",
@@ -387,54 +652,71 @@ def create_app():
                         "severity": rule.severity,
                         "check_type": rule.check_type,
                         "params": rule.params,
-                    },
+                    } if rule else {},
                     "evidence": v.evidence,
                     "employee_identifier": v.employee_identifier,
                 }
+                parts = []
                 try:
-                    from .ai import explain_violation_with_langchain
-                    explanation = explain_violation_with_langchain(payload)
-                    if explanation:
-                        v.explanation = explanation
-                        db_session.add(v)
+                    for delta in explain_violation_stream(payload):
+                        parts.append(delta)
+                        yield "data: " + json.dumps(
+                            {"violation_id": v.id, "delta": delta}
+                        ) + "\n\n"
                 except Exception as e:
-                    print(f"explanation error: {e}")
-
-            db_session.commit()
-
-        flash(
-            f"Compliance run complete. Found {len(violations)} potential violations.",
-            "success",
-        )
-        return redirect(url_for("violations"))
+                    yield "data: " + json.dumps(
+                        {"violation_id": v.id, "error": str(e)}
+                    ) + "\n\n"
+                    continue
+                explanation = "".join(parts).strip()
+                if explanation:
+                    v.explanation = explanation
+                    db.commit()
+            yield 'data: {"done": true}\n\n'
+
+        return Response(stream_with_context(generate()), mimetype="text/event-stream")
 
     # ---- Violations ----
     @app.route("/violations")
     def violations():
-        db = next(get_db())
+        db = g.db
         violations = db.query(Violation).all()
         return render_template("violations.html", violations=violations)
 
     # Simple JSON API for violations (optional)
     @app.route("/api/violations")
     def violations_api():
-        db = next(get_db())
-        vs = db.query(Violation).all()
-        return jsonify(
-            [
-                {
-                    "id": v.id,
-                    "policy_id": v.policy_id,
-                    "rule_id": v.rule_id,
-                    "dataset_id": v.dataset_id,
-                    "employee_identifier": v.employee_identifier,
-                    "evidence": v.evidence,
-                    "risk": v.risk,
-                    "explanation": v.explanation,
-                }
-                for v in vs
-            ]
-        )
+        """Stream the violations table as a JSON array in constant memory."""
+        db = g.db
+
+        # This route streams raw frames, so it bypasses the app's
+        # OrjsonProvider; pick the per-row encoder here explicitly.
+        if orjson is not None:
+            encode = lambda row: orjson.dumps(row).decode()  # noqa: E731
+        else:
+            encode = json.dumps
+
+        def generate():
+            yield "["
+            first = True
+            for v in db.query(Violation).yield_per(500):
+                item = encode(
+                    {
+                        "id": v.id,
+                        "policy_id": v.policy_id,
+                        "rule_id": v.rule_id,
+                        "dataset_id": v.dataset_id,
+                        "employee_identifier": v.employee_identifier,
+                        "evidence": v.evidence,
+                        "risk": v.risk,
+                        "explanation": v.explanation,
+                    }
+                )
+                yield item if first else "," + item
+                first = False
+            yield "]"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
 
     # Simple JSON API: Translate policy text to rules via LLM (no persistence)
     @app.route("/api/extract_rules", methods=["POST"])
@@ -454,7 +736,7 @@ def create_app():
     # ---- Seed demo data ----
     @app.route("/seed")
     def seed():
-        db = next(get_db())
+        db = g.db
         created = _seed_demo_data(db, run_compliance_now=True)
         flash(
             f"Seeded: policy={'yes' if created['policy'] else 'no'}, "
@@ -608,7 +890,7 @@ def _seed_demo_data(db: Session, run_compliance_now: bool = True):
                 continue
             db.query(Violation).filter(
                 Violation.policy_id == policy.id, Violation.dataset_id == ds.id
-            ).delete()
+            ).delete(synchronize_session=False)
             vs = run_compliance(db, policy.id, ds.id)
             total_violations += len(vs)
         created["violations"] = total_violations
@@ -1,97 +1,269 @@
 # app/compliance.py
-import csv
-from datetime import datetime
-from typing import List
+import functools
+import os
+from typing import FrozenSet, List, NamedTuple
+
+import pandas as pd
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+
 from .models import Rule, Dataset, Violation
 
 
-def parse_date(value: str):
-    if not value:
-        return None
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
-        try:
-            return datetime.strptime(value, fmt)
-        except ValueError:
-            continue
+def _parquet_path(csv_path: str) -> str:
+    return csv_path + ".parquet"
+
+
+def convert_to_parquet(csv_path: str) -> bool:
+    """Write a columnar sidecar copy of an uploaded CSV (best-effort).
+
+    Parquet parses ~an order of magnitude faster than CSV on re-reads, so
+    repeat compliance runs skip the text parse. Values stay as strings to
+    match csv.DictReader semantics. Returns False (and leaves only the CSV)
+    on any failure, e.g. pyarrow missing.
+    """
+    try:
+        df = pd.read_csv(
+            csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig"
+        )
+        df.to_parquet(_parquet_path(csv_path), compression="zstd")
+        return True
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=16)
+def _load_df_cached(path: str, mtime: float) -> pd.DataFrame:
+    # mtime participates in the cache key so edits to the file invalidate
+    # the memoized frame.
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+
+def _fresh_parquet_path(csv_path: str):
+    """Path of an up-to-date Parquet sidecar for csv_path, or None.
+
+    The sidecar is (re)written when missing or older than the CSV, so a
+    file swapped in outside the upload route (seed scripts, manual copies)
+    never gets served from a stale sidecar. Returns None when no current
+    sidecar could be produced (e.g. pyarrow missing).
+    """
+    pq = _parquet_path(csv_path)
+    try:
+        csv_mtime = os.path.getmtime(csv_path)
+    except OSError:
+        csv_mtime = None
+    if not os.path.exists(pq) or (
+        csv_mtime is not None and csv_mtime > os.path.getmtime(pq)
+    ):
+        convert_to_parquet(csv_path)
+    if os.path.exists(pq) and (
+        csv_mtime is None or os.path.getmtime(pq) >= csv_mtime
+    ):
+        return pq
     return None
 
 
-def apply_rule_to_row(rule: Rule, row: dict, dataset_type: str):
+def load_dataset_df(dataset: Dataset) -> pd.DataFrame:
+    """Parsed rows for a dataset, preferring the Parquet sidecar.
+
+    Converts the CSV to Parquet on first access and memoizes the parsed
+    DataFrame per (path, mtime), so repeat runs on the same dataset touch
+    neither disk nor the CSV parser. All cells are strings, mirroring what
+    csv.DictReader produced.
     """
-    Returns (is_violation: bool, evidence: str)
+    path = _fresh_parquet_path(dataset.file_path) or dataset.file_path
+    return _load_df_cached(path, os.path.getmtime(path))
+
+
+# Date formats accepted in dataset columns, tried in order.
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+
+
+def _parse_date_column(s: pd.Series) -> pd.Series:
+    """Parse a date column by trying each known format against the whole column.
+
+    A file almost always uses one date format throughout, so the first
+    to_datetime call resolves every cell in one C pass; later formats only
+    fill cells still NaT, instead of raising and catching ValueError per
+    cell like the strptime cascade. Unparseable/empty cells stay NaT.
     """
-    ct = rule.check_type
-
-    # ---------- LEAVE RULES ----------
-    if dataset_type == "leave":
-        # leave_advance_days: request must be N days before leave_start
-        if ct == "leave_advance_days":
-            request_col = rule.params.get("request_date_column", "request_date")
-            start_col = rule.params.get("start_date_column", "leave_start_date")
-            min_days = rule.params.get("min_days_before", 3)
-
-            req_val = row.get(request_col)
-            start_val = row.get(start_col)
-            d_req = parse_date(req_val)
-            d_start = parse_date(start_val)
-
-            if not d_req or not d_start:
-                return False, "Missing or invalid dates"
-
-            diff = (d_start - d_req).days
-            if diff < min_days:
-                return True, (
-                    f"Leave requested {diff} days before start; "
-                    f"policy requires at least {min_days} days."
-                )
-            return False, ""
-
-    # ---------- BENEFIT CLAIM RULES ----------
-    if dataset_type == "benefit":
-        # benefit_max_amount: claim_amount must be <= max_amount
-        if ct == "benefit_max_amount":
-            amount_col = rule.params.get("amount_column", "claim_amount")
-            max_amount = rule.params.get("max_amount", 1000.0)
-            try:
-                amount = float(row.get(amount_col, 0))
-            except ValueError:
-                return False, "Invalid claim amount"
-            if amount > max_amount:
-                return True, (
-                    f"Claim amount {amount} exceeds max allowed {max_amount}."
-                )
-            return False, ""
-
-        # benefit_requires_receipt: receipt flag must be true-ish
-        if ct == "benefit_requires_receipt":
-            receipt_col = rule.params.get("receipt_column", "receipt_attached")
-            val = str(row.get(receipt_col, "")).strip().lower()
-            has_receipt = val in ("yes", "true", "1", "y")
-            if not has_receipt:
-                return True, (
-                    f"Receipt is required but '{receipt_col}' is '{val}'."
-                )
-            return False, ""
-
-        # benefit_allowed_types: claim_type must be in allowed list
-        if ct == "benefit_allowed_types":
-            type_col = rule.params.get("type_column", "claim_type")
-            allowed = [t.lower() for t in rule.params.get("allowed_types", [])]
-            v = str(row.get(type_col, "")).strip().lower()
-            if allowed and v not in allowed:
-                return True, (
-                    f"Claim type '{v}' is not in allowed types: "
-                    f"{', '.join(allowed)}"
-                )
-            return False, ""
+    out = pd.to_datetime(s, format=_DATE_FORMATS[0], errors="coerce")
+    for fmt in _DATE_FORMATS[1:]:
+        if not out.isna().any():
+            break
+        out = out.combine_first(pd.to_datetime(s, format=fmt, errors="coerce"))
+    return out
+
+
+# Rows evaluated per chunk; bounds peak memory when streaming huge CSVs.
+CHUNK_ROWS = 50_000
+
+# Header names recognized as the employee identifier, in preference order.
+_EMP_ID_COLUMNS = ("employee_id", "employee", "emp_id")
+
+# Values counted as "receipt attached"; frozenset gives O(1) membership.
+# Same four values the old tuple check accepted.
+_TRUE_SET = frozenset({"yes", "true", "1", "y"})
+
+# Pending violation dicts are written to the DB once this many accumulate,
+# capping peak memory on datasets with very many violations.
+FLUSH_EVERY = 5000
+
+
+def _iter_dataset_chunks(dataset: Dataset):
+    """Yield DataFrame chunks for a dataset.
 
-    # Unknown / unsupported rule for this dataset
-    return False, "Rule type not applicable or not implemented"
+    Prefers the memoized Parquet-backed frame (sliced into chunks so each
+    pass stays cache-friendly); falls back to streaming the raw CSV with
+    ``read_csv(chunksize=...)`` so oversized uploads never need the whole
+    file in memory at once.
+    """
+    if _fresh_parquet_path(dataset.file_path):
+        df = load_dataset_df(dataset)
+        for start in range(0, len(df), CHUNK_ROWS):
+            yield df.iloc[start : start + CHUNK_ROWS]
+        return
+    for chunk in pd.read_csv(
+        dataset.file_path,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8-sig",
+        chunksize=CHUNK_ROWS,
+    ):
+        yield chunk
+
+
+class _PreparedRule(NamedTuple):
+    """Per-rule params resolved once per run instead of once per chunk.
+
+    Only the fields relevant to the rule's check_type are populated; the
+    rest stay at their defaults.
+    """
+
+    rule: Rule
+    check_type: str
+    request_col: str = "request_date"
+    start_col: str = "leave_start_date"
+    min_days: int = 3
+    amount_col: str = "claim_amount"
+    max_amount: float = 1000.0
+    receipt_col: str = "receipt_attached"
+    type_col: str = "claim_type"
+    allowed: FrozenSet[str] = frozenset()
+    allowed_str: str = ""
+
+
+def _compile_rule(rule: Rule) -> _PreparedRule:
+    params = rule.params or {}
+    allowed_list = [t.lower() for t in params.get("allowed_types", [])]
+    return _PreparedRule(
+        rule=rule,
+        check_type=rule.check_type,
+        request_col=params.get("request_date_column", "request_date"),
+        start_col=params.get("start_date_column", "leave_start_date"),
+        min_days=params.get("min_days_before", 3),
+        amount_col=params.get("amount_column", "claim_amount"),
+        max_amount=params.get("max_amount", 1000.0),
+        receipt_col=params.get("receipt_column", "receipt_attached"),
+        type_col=params.get("type_column", "claim_type"),
+        allowed=frozenset(allowed_list),
+        allowed_str=", ".join(allowed_list),
+    )
+
+
+# ---------- LEAVE RULES ----------
+def _check_leave_advance(prep: _PreparedRule, df: pd.DataFrame):
+    # leave_advance_days: request must be N days before leave_start
+    if prep.request_col not in df.columns or prep.start_col not in df.columns:
+        return []
+    d_req = _parse_date_column(df[prep.request_col])
+    d_start = _parse_date_column(df[prep.start_col])
+    diff = (d_start - d_req).dt.days
+    # NaT rows compare False, matching the old "invalid dates" skip.
+    mask = diff < prep.min_days
+    return [
+        (
+            idx,
+            f"Leave requested {int(d)} days before start; "
+            f"policy requires at least {prep.min_days} days.",
+        )
+        for idx, d in diff[mask].items()
+    ]
+
+
+# ---------- BENEFIT CLAIM RULES ----------
+def _check_benefit_max(prep: _PreparedRule, df: pd.DataFrame):
+    # benefit_max_amount: claim_amount must be <= max_amount
+    if prep.amount_col not in df.columns:
+        return []
+    # Unparseable amounts become NaN and compare False (not a violation).
+    amount = pd.to_numeric(df[prep.amount_col], errors="coerce").astype(float)
+    mask = amount > prep.max_amount
+    return [
+        (idx, f"Claim amount {a} exceeds max allowed {prep.max_amount}.")
+        for idx, a in amount[mask].items()
+    ]
+
+
+def _check_benefit_receipt(prep: _PreparedRule, df: pd.DataFrame):
+    # benefit_requires_receipt: receipt flag must be true-ish
+    if prep.receipt_col in df.columns:
+        # Cells are read with dtype=str, so no astype(str) pass is needed.
+        vals = df[prep.receipt_col].str.strip().str.lower()
+    else:
+        vals = pd.Series("", index=df.index)
+    mask = ~vals.isin(_TRUE_SET)
+    return [
+        (idx, f"Receipt is required but '{prep.receipt_col}' is '{v}'.")
+        for idx, v in vals[mask].items()
+    ]
+
+
+def _check_benefit_types(prep: _PreparedRule, df: pd.DataFrame):
+    # benefit_allowed_types: claim_type must be in allowed list
+    if not prep.allowed:
+        return []
+    if prep.type_col in df.columns:
+        vals = df[prep.type_col].astype(str).str.strip().str.lower()
+    else:
+        vals = pd.Series("", index=df.index)
+    mask = ~vals.isin(prep.allowed)
+    return [
+        (idx, f"Claim type '{v}' is not in allowed types: {prep.allowed_str}")
+        for idx, v in vals[mask].items()
+    ]
+
+
+# check_type -> (dataset_type it applies to, vectorized handler)
+_CHECK_HANDLERS = {
+    "leave_advance_days": ("leave", _check_leave_advance),
+    "benefit_max_amount": ("benefit", _check_benefit_max),
+    "benefit_requires_receipt": ("benefit", _check_benefit_receipt),
+    "benefit_allowed_types": ("benefit", _check_benefit_types),
+}
+
+
+def _rule_violations(prep: _PreparedRule, df: pd.DataFrame, dataset_type: str):
+    """Vectorized rule check: evaluate one rule against a whole chunk.
+
+    Dispatches to the handler for the rule's check_type via one dict lookup
+    instead of cascaded string compares. Each handler builds a boolean mask
+    over the frame, then materializes evidence strings only for the
+    (typically few) violating rows. Returns [(row_label, evidence), ...].
+    """
+    entry = _CHECK_HANDLERS.get(prep.check_type)
+    if entry is None or entry[0] != dataset_type:
+        # Unknown / unsupported rule for this dataset
+        return []
+    return entry[1](prep, df)
 
 
 def run_compliance(db: Session, policy_id: int, dataset_id: int) -> List[Violation]:
-    dataset: Dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+    # db.get serves the dataset from the identity map when already loaded
+    # and skips the query-compilation path of query().filter().first().
+    dataset: Dataset = db.get(Dataset, dataset_id)
     if not dataset:
         raise ValueError("Dataset not found")
 
@@ -106,33 +278,46 @@ def run_compliance(db: Session, policy_id: int, dataset_id: int) -> List[Violati
     if not rules:
         return []
 
+    prepared = [_compile_rule(r) for r in rules]
+    payload: List[dict] = []
     violations_created: List[Violation] = []
 
-    with open(dataset.file_path, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            employee_id = (
-                row.get("employee_id")
-                or row.get("employee")
-                or row.get("emp_id")
-                or "UNKNOWN"
+    def _flush_payload():
+        # Each batch goes out as one multi-row INSERT ... RETURNING inside
+        # the same transaction, so the pending-dict list never grows past
+        # FLUSH_EVERY rows no matter how large the dataset is.
+        if payload:
+            violations_created.extend(
+                db.scalars(insert(Violation).returning(Violation), payload)
             )
-            for rule in rules:
-                is_violation, evidence = apply_rule_to_row(rule, row, dataset_type)
-                if is_violation:
-                    v = Violation(
-                        policy_id=policy_id,
-                        rule_id=rule.id,
-                        dataset_id=dataset_id,
-                        employee_identifier=employee_id,
-                        evidence=evidence,
-                        risk=rule.severity or "medium",
-                    )
-                    db.add(v)
-                    violations_created.append(v)
+            payload.clear()
+
+    for chunk in _iter_dataset_chunks(dataset):
+        # Resolve the employee-id column once per chunk from the header
+        # instead of a 3-way or-chain of dict lookups per violating row.
+        emp_col = next((c for c in _EMP_ID_COLUMNS if c in chunk.columns), None)
+        emp = chunk[emp_col] if emp_col else None
+        for prep in prepared:
+            rule = prep.rule
+            hits = _rule_violations(prep, chunk, dataset_type)
+            if not hits:
+                continue
+            for idx, evidence in hits:
+                employee_id = (emp.at[idx] if emp is not None else "") or "UNKNOWN"
+                payload.append(
+                    {
+                        "policy_id": policy_id,
+                        "rule_id": rule.id,
+                        "dataset_id": dataset_id,
+                        "employee_identifier": employee_id,
+                        "evidence": evidence,
+                        "risk": rule.severity or "medium",
+                    }
+                )
+                if len(payload) >= FLUSH_EVERY:
+                    _flush_payload()
 
+    _flush_payload()
     db.commit()
-    for v in violations_created:
-        db.refresh(v)
     return violations_created
 
@@ -1,5 +1,7 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, JSON
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -14,12 +16,19 @@ class Policy(Base):
     # "leave" | "benefit" | "both"
     scope = Column(String, default="both")
 
+    # sha256 of (raw_text + scope) at the time rules were last extracted;
+    # lets the extract routes skip the LLM when nothing changed.
+    text_hash = Column(String, nullable=True)
+
     rules = relationship("Rule", back_populates="policy", cascade="all, delete-orphan")
 
 
 class Rule(Base):
     __tablename__ = "rules"
 
+    # run_compliance filters on (policy_id, category) every run.
+    __table_args__ = (Index("ix_rule_policy_category", "policy_id", "category"),)
+
     id = Column(Integer, primary_key=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.id"))
 
@@ -55,6 +64,10 @@ class Dataset(Base):
 class Violation(Base):
     __tablename__ = "violations"
 
+    # The pre-run cleanup deletes by (policy_id, dataset_id); without this
+    # index that's a full table scan per run.
+    __table_args__ = (Index("ix_viol_policy_dataset", "policy_id", "dataset_id"),)
+
     id = Column(Integer, primary_key=True, index=True)
     policy_id = Column(Integer, ForeignKey("policies.id"))
     rule_id = Column(Integer, ForeignKey("rules.id"))
@@ -69,3 +82,18 @@ class Violation(Base):
     rule = relationship("Rule")
     dataset = relationship("Dataset")
 
+
+class LlmCache(Base):
+    """Exact-match cache of LLM responses keyed by a hash of the prompt.
+
+    Responses are deterministic at temperature=0, so identical prompts can be
+    served without a network round-trip. Stored in the app DB so the cache
+    survives restarts.
+    """
+
+    __tablename__ = "llm_cache"
+
+    key = Column(String, primary_key=True)  # sha256 of the rendered messages
+    response = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
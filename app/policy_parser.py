@@ -1,17 +1,138 @@
 import re
 from typing import Any, Dict, List
 
+# Prefer google-re2 when installed: it matches in guaranteed linear time
+# (no catastrophic backtracking on adversarial policy text) and exposes the
+# same compile/search/finditer surface. Policy text is user-supplied, so the
+# worst case matters. Falls back to stdlib re. Case-insensitivity is spelled
+# inline as (?i) because re2.compile doesn't accept stdlib int flags.
+try:
+    import re2 as _re
+
+    # Probe the constructs this module relies on (inline flag, word
+    # boundary, named group); some builds lack full syntax support.
+    _re.compile(r"(?i)\b(?P<probe>test)\b")
+except Exception:
+    _re = re
+
+# Helper patterns compiled once at import; per-call re.search still pays the
+# compile-cache lookup on every parse.
+_RE_WS = _re.compile(r"\s+")
+_RE_NUM_PREFIX = _re.compile(r"^[^0-9.-]+")
+_RE_CONJ = _re.compile(r"(?i)\s+(and|or)\s+")
+
+# One alternation covering every supported sentence form, so a parse is a
+# single scan of the text instead of one scan per pattern. Outer group names
+# identify the sentence form; inner group names carry captured values.
+_PATTERNS = {
+    "leave_advance": r"\b(?:annual\s+)?leave\s+must\s+be\s+requested\s+at\s+least\s+(?P<leave_days>\d+)\s+days\s+before\s+(?:the\s+)?(?:leave\s+)?start\s+date\b",
+    "claim_above": r"\bclaims?\s+(?:above|over|greater\s+than)\s+(?P<above_amt>[$€£]?\s*[0-9][0-9,]*\.?[0-9]*)\b",
+    "claim_leq": r"\bclaim\s+amount\s+must\s+be\s*(?:<=|less\s+than\s+or\s+equal\s+to)\s+(?P<leq_amt>[$€£]?\s*[0-9][0-9,]*\.?[0-9]*)\b",
+    "receipt": r"\b(?:a\s+)?receipt\s+must\s+be\s+attached\s+for\s+all\s+claims\b|\ball\s+benefit\s+claims\s+require\s+a\s+receipt\b",
+    "allowed_types": r"\ballowed\s+claim\s+types\s+(?:include|are)\s+(?P<allowed_list>[^\.]+)\.",
+}
+_RE_ALL = _re.compile(
+    "(?i)" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in _PATTERNS.items())
+)
+
 
 def _to_number(text: str) -> float:
     # Remove currency symbols and commas, handle simple decimals
     t = text.strip().replace(",", "")
-    t = re.sub(r"^[^0-9.-]+", "", t)  # trim non-numeric prefix like $
+    t = _RE_NUM_PREFIX.sub("", t)  # trim non-numeric prefix like $
     try:
         return float(t)
     except Exception:
         return 0.0
 
 
+def _build_leave_advance(m: "re.Match", rules: List[Dict[str, Any]], rule_code: str) -> None:
+    days = int(m.group("leave_days"))
+    rules.append(
+        {
+            "rule_code": rule_code,
+            "description": f"Annual leave must be requested at least {days} days before the start date.",
+            "category": "leave",
+            "severity": "medium",
+            "check_type": "leave_advance_days",
+            "params": {
+                "request_date_column": "request_date",
+                "start_date_column": "leave_start_date",
+                "min_days_before": days,
+            },
+        }
+    )
+
+
+def _build_claim_max(m: "re.Match", rules: List[Dict[str, Any]], rule_code: str) -> None:
+    amt = _to_number(m.group("above_amt") or m.group("leq_amt"))
+    rules.append(
+        {
+            "rule_code": rule_code,
+            "description": f"Claim amount must be <= {int(amt) if amt.is_integer() else amt}.",
+            "category": "benefit",
+            "severity": "high",
+            "check_type": "benefit_max_amount",
+            "params": {"amount_column": "claim_amount", "max_amount": amt},
+        }
+    )
+
+
+def _build_receipt(m: "re.Match", rules: List[Dict[str, Any]], rule_code: str) -> None:
+    rules.append(
+        {
+            "rule_code": rule_code,
+            "description": "All benefit claims require a receipt.",
+            "category": "benefit",
+            "severity": "medium",
+            "check_type": "benefit_requires_receipt",
+            "params": {"receipt_column": "receipt_attached"},
+        }
+    )
+
+
+def _build_allowed_types(m: "re.Match", rules: List[Dict[str, Any]], rule_code: str) -> None:
+    raw = m.group("allowed_list")
+    # Turn 'and'/'or' conjunctions into commas once, then let str.split do
+    # the actual tokenizing in C instead of a regex alternation per char.
+    # The substitution needs whitespace before the conjunction, so a token
+    # from comma-without-space input ("...,and travel") can still carry a
+    # leading conjunction; strip it per token like the baseline did.
+    normalized = _RE_CONJ.sub(",", raw.strip())
+    types: List[str] = []
+    for p in normalized.split(","):
+        t = p.strip().lower()
+        if t.startswith("and "):
+            t = t[4:].lstrip()
+        elif t.startswith("or "):
+            t = t[3:].lstrip()
+        if t:
+            types.append(t)
+    if not types:
+        return
+    rules.append(
+        {
+            "rule_code": rule_code,
+            "description": f"Allowed claim types are {', '.join(types)}.",
+            "category": "benefit",
+            "severity": "low",
+            "check_type": "benefit_allowed_types",
+            "params": {"type_column": "claim_type", "allowed_types": types},
+        }
+    )
+
+
+# Dispatch by matched outer group: (category, check_type, builder).
+# claim_above/claim_leq are two surface forms of the same rule.
+_BUILDERS = {
+    "leave_advance": ("leave", "leave_advance_days", _build_leave_advance),
+    "claim_above": ("benefit", "benefit_max_amount", _build_claim_max),
+    "claim_leq": ("benefit", "benefit_max_amount", _build_claim_max),
+    "receipt": ("benefit", "benefit_requires_receipt", _build_receipt),
+    "allowed_types": ("benefit", "benefit_allowed_types", _build_allowed_types),
+}
+
+
 def parse_rules_from_text(policy_text: str, scope: str = "both") -> List[Dict[str, Any]]:
     """Parse a constrained set of simple-English policy sentences into rule dicts.
 
@@ -33,104 +154,50 @@ def parse_rules_from_text(policy_text: str, scope: str = "both") -> List[Dict[st
 
     want_leave = scope in ("both", "leave")
     want_benefit = scope in ("both", "benefit")
+    if not (want_leave or want_benefit):
+        # Unknown scope disables every branch; skip the regex work entirely.
+        return rules
+
+    # Normalize whitespace for simpler regex. Substring checks are a single
+    # C scan each, so probing for redundant whitespace is far cheaper than
+    # unconditionally running the regex substitution (which allocates a new
+    # string even when nothing changes).
+    if "  " in text or "\t" in text or "\n" in text or "\r" in text:
+        normalized = _RE_WS.sub(" ", text)
+    else:
+        normalized = text
+
+    # One pass over the text collects the first match per sentence form.
+    first_match: Dict[str, Any] = {}
+    for m in _RE_ALL.finditer(normalized):
+        for name in _BUILDERS:
+            if m.group(name) is not None:
+                first_match.setdefault(name, m)
+                break
 
-    # Normalize whitespace for simpler regex
-    normalized = re.sub(r"\s+", " ", text)
-
-    # --- Leave: advance notice ---
-    if want_leave:
-        m = re.search(
-            r"\b(?:annual\s+)?leave\s+must\s+be\s+requested\s+at\s+least\s+(\d+)\s+days\s+before\s+(?:the\s+)?(?:leave\s+)?start\s+date\b",
-            normalized,
-            flags=re.IGNORECASE,
-        )
-        if m:
-            days = int(m.group(1))
-            rules.append(
-                {
-                    "rule_code": f"LEAVE_{len([r for r in rules if r.get('category')=='leave'])+1:03d}",
-                    "description": f"Annual leave must be requested at least {days} days before the start date.",
-                    "category": "leave",
-                    "severity": "medium",
-                    "check_type": "leave_advance_days",
-                    "params": {
-                        "request_date_column": "request_date",
-                        "start_date_column": "leave_start_date",
-                        "min_days_before": days,
-                    },
-                }
-            )
-
-    # --- Benefit: max amount ---
-    if want_benefit:
-        m1 = re.search(
-            r"\bclaims?\s+(?:above|over|greater\s+than)\s+([$€£]?\s*[0-9][0-9,]*\.?[0-9]*)\b",
-            normalized,
-            flags=re.IGNORECASE,
-        )
-        m2 = re.search(
-            r"\bclaim\s+amount\s+must\s+be\s*(?:<=|less\s+than\s+or\s+equal\s+to)\s+([$€£]?\s*[0-9][0-9,]*\.?[0-9]*)\b",
-            normalized,
-            flags=re.IGNORECASE,
-        )
-        if m1 or m2:
-            amt = _to_number((m1 or m2).group(1))
-            rules.append(
-                {
-                    "rule_code": f"BEN_{len([r for r in rules if r.get('category')=='benefit'])+1:03d}",
-                    "description": f"Claim amount must be <= {int(amt) if amt.is_integer() else amt}.",
-                    "category": "benefit",
-                    "severity": "high",
-                    "check_type": "benefit_max_amount",
-                    "params": {"amount_column": "claim_amount", "max_amount": amt},
-                }
-            )
-
-        # --- Benefit: receipt required ---
-        if re.search(
-            r"\b(?:a\s+)?receipt\s+must\s+be\s+attached\s+for\s+all\s+claims\b|\ball\s+benefit\s+claims\s+require\s+a\s+receipt\b",
-            normalized,
-            flags=re.IGNORECASE,
-        ):
-            rules.append(
-                {
-                    "rule_code": f"BEN_{len([r for r in rules if r.get('category')=='benefit'])+1:03d}",
-                    "description": "All benefit claims require a receipt.",
-                    "category": "benefit",
-                    "severity": "medium",
-                    "check_type": "benefit_requires_receipt",
-                    "params": {"receipt_column": "receipt_attached"},
-                }
-            )
-
-        # --- Benefit: allowed types ---
-        m3 = re.search(
-            r"\ballowed\s+claim\s+types\s+(?:include|are)\s+([^\.]+)\.",
-            normalized,
-            flags=re.IGNORECASE,
-        )
-        if m3:
-            raw = m3.group(1)
-            # Split on commas and 'and', then strip any leading conjunctions
-            parts = re.split(r"\s*,\s*|\s+and\s+|\s+or\s+", raw.strip())
-            cleaned: List[str] = []
-            for p in parts:
-                t = p.strip().lower()
-                if not t:
-                    continue
-                t = re.sub(r"^(and|or)\s+", "", t)
-                cleaned.append(t)
-            types = [t for t in cleaned if t]
-            if types:
-                rules.append(
-                    {
-                        "rule_code": f"BEN_{len([r for r in rules if r.get('category')=='benefit'])+1:03d}",
-                        "description": f"Allowed claim types are {', '.join(types)}.",
-                        "category": "benefit",
-                        "severity": "low",
-                        "check_type": "benefit_allowed_types",
-                        "params": {"type_column": "claim_type", "allowed_types": types},
-                    }
-                )
+    # Emit in _BUILDERS declaration order — the same fixed order (and the
+    # same claims-above-over-<=-form priority, via the check_type dedupe)
+    # as the old per-pattern re.search cascade, so rule codes and picked
+    # thresholds are unchanged. Running per-category counters number the
+    # rule codes (LEAVE_001, BEN_002, ...).
+    seen_check_types = set()
+    counts = {"leave": 0, "benefit": 0}
+    prefixes = {"leave": "LEAVE", "benefit": "BEN"}
+    for name, (category, check_type, build) in _BUILDERS.items():
+        m = first_match.get(name)
+        if m is None:
+            continue
+        if check_type in seen_check_types:
+            continue
+        if category == "leave" and not want_leave:
+            continue
+        if category == "benefit" and not want_benefit:
+            continue
+        rule_code = f"{prefixes[category]}_{counts[category] + 1:03d}"
+        before = len(rules)
+        build(m, rules, rule_code)
+        if len(rules) > before:
+            counts[category] += 1
+            seen_check_types.add(check_type)
 
     return rules
@@ -2,13 +2,11 @@ import os
 import sys
 
 try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-except Exception as e:
-    print(
-        "Missing dependency: install 'langchain-google-genai' and 'google-generativeai'.",
-        e,
-    )
-    sys.exit(1)
+    # _get_llm memoizes the client per (model, api_key), so this probe warms
+    # the same instance the extraction path reuses.
+    from .ai import MissingDepsError, _get_llm
+except Exception:  # pragma: no cover - direct script execution
+    from app.ai import MissingDepsError, _get_llm
 
 
 def main():
@@ -17,17 +15,22 @@ def main():
         print("GOOGLE_API_KEY environment variable is not set.")
         sys.exit(1)
 
-    # Keep in sync with app/ai.py behavior
+    # Same resolution as app/ai.py: GEMINI_MODEL with "-latest" stripped
     model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash").strip()
     if model.endswith("-latest"):
         model = model[: -len("-latest")]
 
     print(f"Using model: {model}")
     try:
-        # Prefer explicit api_key param to avoid ADC/OAuth confusion
-        llm = ChatGoogleGenerativeAI(model=model, temperature=0, api_key=api_key)
+        llm = _get_llm()
         res = llm.invoke("Say 'Gemini model working' in one short sentence.")
         print(getattr(res, "content", str(res)))
+    except MissingDepsError as e:
+        print(
+            "Missing dependency: install 'langchain-google-genai' and 'google-generativeai'.",
+            e,
+        )
+        sys.exit(1)
     except Exception as e:
         msg = str(e)
         print("LLM test failed:", msg)
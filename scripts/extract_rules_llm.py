@@ -3,8 +3,24 @@ import json
 import os
 import sys
 
-# Reuse the app's LangChain/LangGraph-based extractor
-from app.ai import extract_rules_with_langgraph
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Reuse the app's LangChain-based extractors
+from app.ai import extract_rules_with_langgraph, extract_rules_with_langgraph_batch
+
+
+def dump_rules(rules, pretty: bool = False) -> str:
+    """Serialize rules to JSON, via orjson when available (2-3x faster,
+    and compact by default)."""
+    if orjson is not None:
+        opts = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(rules, option=opts).decode()
+    if pretty:
+        return json.dumps(rules, indent=2, ensure_ascii=False)
+    return json.dumps(rules, ensure_ascii=False, separators=(",", ":"))
 
 
 def read_policy_text(path: str | None) -> str:
@@ -23,10 +39,14 @@ def main():
         description="Use an LLM to translate policy text into JSON rules."
     )
     parser.add_argument(
-        "input",
-        nargs="?",
-        default="-",
-        help="Path to policy text file, or '-' for stdin (default)",
+        "inputs",
+        nargs="*",
+        default=["-"],
+        help=(
+            "Paths to policy text files, or '-' for stdin (default). "
+            "Several files are extracted in one batched LLM call; the "
+            "output is then an array of per-file rule arrays."
+        ),
     )
     parser.add_argument(
         "--scope",
@@ -49,18 +69,19 @@ def main():
             file=sys.stderr,
         )
 
-    policy_text = read_policy_text(args.input)
+    texts = [read_policy_text(path) for path in args.inputs]
 
     try:
-        rules = extract_rules_with_langgraph(policy_text, scope=args.scope)
+        if len(texts) == 1:
+            rules = extract_rules_with_langgraph(texts[0], scope=args.scope)
+        else:
+            # One LLM round-trip for all files instead of one per file.
+            rules = extract_rules_with_langgraph_batch(texts, scope=args.scope)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         raise SystemExit(1)
 
-    if args.pretty:
-        print(json.dumps(rules, indent=2, ensure_ascii=False))
-    else:
-        print(json.dumps(rules, ensure_ascii=False))
+    print(dump_rules(rules, pretty=args.pretty))
 
 
 if __name__ == "__main__":